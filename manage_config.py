@@ -8,10 +8,33 @@ import boto3
 import json
 import argparse
 import sys
+from collections import ChainMap
 from datetime import datetime
 from botocore.exceptions import ClientError
 
+# 列出配置时需要显示的字段
+LIST_ATTRIBUTES = (
+    'config_id', 'description', 'tag_key', 'tag_value', 'start_time', 'stop_time',
+    'timezone', 'enabled', 'dry_run', 'exclude_instance_ids', 'notification_topic',
+    'created_at', 'updated_at'
+)
+
 class ConfigManager:
+    # 配置信息输出模板
+    _CONFIG_TEMPLATE = (
+        "🔧 配置ID: {config_id}\n"
+        "📝 描述: {description}\n"
+        "🏷️  标签: {tag_key}={tag_value}\n"
+        "⏰ 启动时间: {start_time} ({timezone})\n"
+        "⏹️  停止时间: {stop_time} ({timezone})\n"
+        "✅ 启用状态: {enabled_text}\n"
+        "🧪 测试模式: {dry_run_text}"
+    )
+    _EXCLUDE_TEMPLATE = "🚫 排除实例: {}"
+    _TOPIC_TEMPLATE = "📧 通知主题: {}"
+    _TIMESTAMP_TEMPLATE = "📅 创建时间: {created_at}\n📅 更新时间: {updated_at}"
+    _FORMAT_DEFAULTS = {'description': 'N/A', 'created_at': 'N/A', 'updated_at': 'N/A'}
+    
     def __init__(self, table_name):
         self.dynamodb = boto3.resource('dynamodb')
         self.table = self.dynamodb.Table(table_name)
@@ -20,8 +43,18 @@ class ConfigManager:
     def list_configs(self):
         """列出所有配置"""
         try:
-            response = self.table.scan()
-            configs = response['Items']
+            # 分页扫描，只读取需要显示的字段（字段名统一使用占位符，避免与保留字冲突）
+            scan_kwargs = {
+                'ProjectionExpression': ', '.join(f'#{attr}' for attr in LIST_ATTRIBUTES),
+                'ExpressionAttributeNames': {f'#{attr}': attr for attr in LIST_ATTRIBUTES}
+            }
+            configs = []
+            while True:
+                response = self.table.scan(**scan_kwargs)
+                configs.extend(response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
             
             if not configs:
                 print("❌ 未找到任何配置")
@@ -30,9 +63,10 @@ class ConfigManager:
             print(f"📋 配置表: {self.table_name}")
             print(f"📊 共找到 {len(configs)} 个配置:\n")
             
-            for config in configs:
-                self._print_config(config)
-                print("-" * 50)
+            # 拼接后一次性输出，减少逐行print的开销
+            separator = "-" * 50
+            sys.stdout.write("".join(f"{self._format_config(config)}\n{separator}\n" for config in configs))
+            sys.stdout.flush()
                 
         except ClientError as e:
             print(f"❌ 获取配置失败: {e}")
@@ -46,7 +80,7 @@ class ConfigManager:
                 return None
             
             config = response['Item']
-            self._print_config(config)
+            print(self._format_config(config))
             return config
             
         except ClientError as e:
@@ -57,8 +91,8 @@ class ConfigManager:
         """创建新配置"""
         try:
             # 添加时间戳
-            config_data['created_at'] = datetime.utcnow().isoformat() + 'Z'
-            config_data['updated_at'] = datetime.utcnow().isoformat() + 'Z'
+            now = datetime.utcnow().isoformat() + 'Z'
+            config_data['created_at'] = config_data['updated_at'] = now
             
             self.table.put_item(Item=config_data)
             print(f"✅ 配置创建成功: {config_data['config_id']}")
@@ -70,16 +104,13 @@ class ConfigManager:
         """更新配置"""
         try:
             # 构建更新表达式
-            update_expression = "SET "
-            expression_values = {}
-            
-            for key, value in updates.items():
-                update_expression += f"{key} = :{key}, "
-                expression_values[f":{key}"] = value
+            set_parts = [f"{key} = :{key}" for key in updates]
+            expression_values = {f":{key}": value for key, value in updates.items()}
             
             # 添加更新时间
-            update_expression += "updated_at = :updated_at"
+            set_parts.append("updated_at = :updated_at")
             expression_values[":updated_at"] = datetime.utcnow().isoformat() + 'Z'
+            update_expression = "SET " + ", ".join(set_parts)
             
             self.table.update_item(
                 Key={'config_id': config_id},
@@ -101,24 +132,95 @@ class ConfigManager:
         except ClientError as e:
             print(f"❌ 删除配置失败: {e}")
     
-    def _print_config(self, config):
-        """打印配置信息"""
-        print(f"🔧 配置ID: {config['config_id']}")
-        print(f"📝 描述: {config.get('description', 'N/A')}")
-        print(f"🏷️  标签: {config['tag_key']}={config['tag_value']}")
-        print(f"⏰ 启动时间: {config['start_time']} ({config['timezone']})")
-        print(f"⏹️  停止时间: {config['stop_time']} ({config['timezone']})")
-        print(f"✅ 启用状态: {'是' if config['enabled'] else '否'}")
-        print(f"🧪 测试模式: {'是' if config.get('dry_run', False) else '否'}")
+    def _format_config(self, config):
+        """格式化配置信息"""
+        values = ChainMap({
+            'enabled_text': '是' if config['enabled'] else '否',
+            'dry_run_text': '是' if config.get('dry_run', False) else '否'
+        }, config, self._FORMAT_DEFAULTS)
+        
+        parts = [self._CONFIG_TEMPLATE.format_map(values)]
         
         if config.get('exclude_instance_ids'):
-            print(f"🚫 排除实例: {', '.join(config['exclude_instance_ids'])}")
+            parts.append(self._EXCLUDE_TEMPLATE.format(', '.join(config['exclude_instance_ids'])))
         
         if config.get('notification_topic'):
-            print(f"📧 通知主题: {config['notification_topic']}")
+            parts.append(self._TOPIC_TEMPLATE.format(config['notification_topic']))
         
-        print(f"📅 创建时间: {config.get('created_at', 'N/A')}")
-        print(f"📅 更新时间: {config.get('updated_at', 'N/A')}")
+        parts.append(self._TIMESTAMP_TEMPLATE.format_map(values))
+        return "\n".join(parts)
+
+def cmd_list(manager, args):
+    """list命令"""
+    manager.list_configs()
+
+def cmd_get(manager, args):
+    """get命令"""
+    manager.get_config(args.config_id)
+
+def cmd_create(manager, args):
+    """create命令"""
+    config_data = {
+        'config_id': args.config_id,
+        'tag_key': args.tag_key,
+        'tag_value': args.tag_value,
+        'start_time': args.start_time,
+        'stop_time': args.stop_time,
+        'timezone': args.timezone,
+        'enabled': args.enabled,
+        'dry_run': args.dry_run,
+        'exclude_instance_ids': args.exclude_instances or [],
+        'description': args.description or f'配置 {args.config_id}'
+    }
+    
+    if args.notification_topic:
+        config_data['notification_topic'] = args.notification_topic
+    
+    manager.create_config(config_data)
+
+def cmd_update(manager, args):
+    """update命令"""
+    updates = {}
+    
+    if args.tag_key:
+        updates['tag_key'] = args.tag_key
+    if args.tag_value:
+        updates['tag_value'] = args.tag_value
+    if args.start_time:
+        updates['start_time'] = args.start_time
+    if args.stop_time:
+        updates['stop_time'] = args.stop_time
+    if args.timezone:
+        updates['timezone'] = args.timezone
+    if args.enabled is not None:
+        updates['enabled'] = args.enabled
+    if args.dry_run is not None:
+        updates['dry_run'] = args.dry_run
+    if args.description:
+        updates['description'] = args.description
+    
+    if not updates:
+        print("❌ 没有指定要更新的字段")
+        return
+    
+    manager.update_config(args.config_id, updates)
+
+def cmd_delete(manager, args):
+    """delete命令"""
+    if not args.confirm:
+        print("❌ 请使用 --confirm 参数确认删除操作")
+        return
+    
+    manager.delete_config(args.config_id)
+
+# 命令分发表
+COMMANDS = {
+    'list': cmd_list,
+    'get': cmd_get,
+    'create': cmd_create,
+    'update': cmd_update,
+    'delete': cmd_delete
+}
 
 def main():
     parser = argparse.ArgumentParser(description='EC2调度器配置管理工具')
@@ -171,64 +273,7 @@ def main():
         return
     
     manager = ConfigManager(args.table)
-    
-    if args.command == 'list':
-        manager.list_configs()
-        
-    elif args.command == 'get':
-        manager.get_config(args.config_id)
-        
-    elif args.command == 'create':
-        config_data = {
-            'config_id': args.config_id,
-            'tag_key': args.tag_key,
-            'tag_value': args.tag_value,
-            'start_time': args.start_time,
-            'stop_time': args.stop_time,
-            'timezone': args.timezone,
-            'enabled': args.enabled,
-            'dry_run': args.dry_run,
-            'exclude_instance_ids': args.exclude_instances or [],
-            'description': args.description or f'配置 {args.config_id}'
-        }
-        
-        if args.notification_topic:
-            config_data['notification_topic'] = args.notification_topic
-        
-        manager.create_config(config_data)
-        
-    elif args.command == 'update':
-        updates = {}
-        
-        if args.tag_key:
-            updates['tag_key'] = args.tag_key
-        if args.tag_value:
-            updates['tag_value'] = args.tag_value
-        if args.start_time:
-            updates['start_time'] = args.start_time
-        if args.stop_time:
-            updates['stop_time'] = args.stop_time
-        if args.timezone:
-            updates['timezone'] = args.timezone
-        if args.enabled is not None:
-            updates['enabled'] = args.enabled
-        if args.dry_run is not None:
-            updates['dry_run'] = args.dry_run
-        if args.description:
-            updates['description'] = args.description
-        
-        if not updates:
-            print("❌ 没有指定要更新的字段")
-            return
-        
-        manager.update_config(args.config_id, updates)
-        
-    elif args.command == 'delete':
-        if not args.confirm:
-            print("❌ 请使用 --confirm 参数确认删除操作")
-            return
-        
-        manager.delete_config(args.config_id)
+    COMMANDS[args.command](manager, args)
 
 if __name__ == '__main__':
     main()
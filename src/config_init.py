@@ -9,6 +9,9 @@ logger.setLevel(logging.INFO)
 
 dynamodb = boto3.resource('dynamodb')
 
+# HTTP连接池（容器复用期间共享，发送CloudFormation响应失败时自动重试）
+http = urllib3.PoolManager(num_pools=4, maxsize=4, retries=urllib3.Retry(total=2, backoff_factor=0.2))
+
 def send_response(event, context, response_status, response_data=None, physical_resource_id=None):
     """发送CloudFormation自定义资源响应"""
     if response_data is None:
@@ -26,7 +29,8 @@ def send_response(event, context, response_status, response_data=None, physical_
         'Data': response_data
     }
     
-    json_response_body = json.dumps(response_body)
+    # 紧凑格式序列化；保持ASCII输出，使content-length的字符数与字节数一致
+    json_response_body = json.dumps(response_body, separators=(',', ':'))
     
     headers = {
         'content-type': '',
@@ -34,7 +38,6 @@ def send_response(event, context, response_status, response_data=None, physical_
     }
     
     try:
-        http = urllib3.PoolManager()
         response = http.request('PUT', response_url, body=json_response_body, headers=headers)
         logger.info(f"CloudFormation响应状态: {response.status}")
     except Exception as e:
@@ -61,15 +64,15 @@ def create_default_config(table_name):
     }
     
     try:
-        # 检查配置是否已存在
-        response = table.get_item(Key={'config_id': 'default'})
-        if 'Item' in response:
-            logger.info("默认配置已存在，跳过创建")
-            return True
-        
-        # 创建默认配置
-        table.put_item(Item=default_config)
-        logger.info("默认配置创建成功")
+        # 仅在默认配置不存在时创建，检查和写入在一次请求中原子完成
+        try:
+            table.put_item(Item=default_config, ConditionExpression='attribute_not_exists(config_id)')
+            logger.info("默认配置创建成功")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info("默认配置已存在，跳过创建")
+                return True
+            raise
         
         # 创建示例配置
         example_config = {
@@ -99,7 +102,8 @@ def create_default_config(table_name):
 
 def lambda_handler(event, context):
     """Lambda入口函数"""
-    logger.info(f"收到事件: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("收到事件: %s", json.dumps(event))
     
     try:
         request_type = event['RequestType']
@@ -2,38 +2,105 @@ import json
 import boto3
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time
+from time import monotonic
 from typing import Dict, List, Optional, Tuple
-import pytz
+from zoneinfo import ZoneInfo
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # 配置日志
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-# AWS客户端
-ec2_client = boto3.client('ec2')
-dynamodb = boto3.resource('dynamodb')
-sns_client = boto3.client('sns')
+# AWS客户端（启用TCP keep-alive，容器复用期间复用已建立的连接）
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    connect_timeout=3,
+    read_timeout=10
+)
+ec2_client = boto3.client('ec2', config=boto_config)
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+sns_client = boto3.client('sns', config=boto_config)
 
 # 环境变量
 CONFIG_TABLE_NAME = os.environ['CONFIG_TABLE_NAME']
 config_table = dynamodb.Table(CONFIG_TABLE_NAME)
+# 缓存时间默认取调度周期（10分钟）的1.5倍：相邻两次定时调用中后一次复用缓存，
+# 配置修改最多晚一个调度周期生效；修改调度频率时需同步调整
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '900'))
+
+# 配置缓存（容器复用期间跨调用保留）
+_CONFIG_CACHE = {'item': None, 'ts': 0.0}
+
+# 启停实例的批次大小和并发数
+INSTANCE_BATCH_SIZE = 200
+INSTANCE_BATCH_WORKERS = 8
+
+# 启停操作：对应的EC2 API、返回结果字段、需要操作的实例状态
+STATE_ACTIONS = {
+    'start': {
+        'api': 'start_instances',
+        'result_key': 'StartingInstances',
+        'source_state': 'stopped',
+        'label': '启动'
+    },
+    'stop': {
+        'api': 'stop_instances',
+        'result_key': 'StoppingInstances',
+        'source_state': 'running',
+        'label': '停止'
+    }
+}
+
+# 触发窗口：目标时间前后5分钟
+TRIGGER_WINDOW_SECONDS = 300
+SECONDS_PER_DAY = 24 * 3600
+
+def _chunks(items: List[str], size: int = INSTANCE_BATCH_SIZE):
+    """按批次切分列表"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _run_in_batches(batch_func, instance_ids: List[str]) -> Dict:
+    """分批并发执行操作并汇总结果，batch_func返回(成功列表, 失败列表)"""
+    # 只有一个批次时直接调用，避免创建线程池
+    if len(instance_ids) <= INSTANCE_BATCH_SIZE:
+        success_ids, failed_ids = batch_func(instance_ids)
+        return {'success': list(success_ids), 'failed': list(failed_ids)}
+    
+    result = {'success': [], 'failed': []}
+    with ThreadPoolExecutor(max_workers=INSTANCE_BATCH_WORKERS) as executor:
+        for success_ids, failed_ids in executor.map(batch_func, _chunks(instance_ids)):
+            result['success'].extend(success_ids)
+            result['failed'].extend(failed_ids)
+    return result
 
 class EC2Scheduler:
     def __init__(self):
         self.config = self._load_config()
+        self._exclude_ids = frozenset(self.config.get('exclude_instance_ids') or [])
     
     def _load_config(self) -> Dict:
-        """从DynamoDB加载配置"""
+        """从DynamoDB加载配置，缓存未过期时直接复用"""
+        if _CONFIG_CACHE['item'] is not None and monotonic() - _CONFIG_CACHE['ts'] < CONFIG_CACHE_TTL_SECONDS:
+            logger.info("使用缓存的配置")
+            return _CONFIG_CACHE['item']
+        
         try:
-            response = config_table.get_item(Key={'config_id': 'default'})
+            response = config_table.get_item(Key={'config_id': 'default'}, ConsistentRead=False)
             if 'Item' not in response:
                 logger.warning("未找到默认配置，使用内置默认值")
-                return self._get_default_config()
+                config = self._get_default_config()
+            else:
+                config = response['Item']
+                logger.info(f"已加载配置: {json.dumps(config, default=str, ensure_ascii=False)}")
             
-            config = response['Item']
-            logger.info(f"已加载配置: {json.dumps(config, default=str, ensure_ascii=False)}")
+            _CONFIG_CACHE['item'] = config
+            _CONFIG_CACHE['ts'] = monotonic()
             return config
             
         except ClientError as e:
@@ -57,59 +124,38 @@ class EC2Scheduler:
     
     def _get_current_time_in_timezone(self) -> datetime:
         """获取指定时区的当前时间"""
-        tz = pytz.timezone(self.config.get('timezone', 'Asia/Shanghai'))
-        return datetime.now(tz)
+        return datetime.now(self._tz)
     
     def _parse_time(self, time_str: str) -> time:
         """解析时间字符串"""
         hour, minute = map(int, time_str.split(':'))
         return time(hour, minute)
     
-    def _should_start_instances(self, current_time: datetime) -> bool:
-        """判断是否应该启动实例"""
-        start_time = self._parse_time(self.config['start_time'])
-        current_time_only = current_time.time()
-        
-        # 检查是否在启动时间的前后5分钟内
-        start_datetime = datetime.combine(current_time.date(), start_time)
-        start_datetime = start_datetime.replace(tzinfo=current_time.tzinfo)
-        
-        time_diff = abs((current_time - start_datetime).total_seconds())
-        return time_diff <= 300  # 5分钟内
+    def _seconds_of_day(self, t: time) -> int:
+        """转换为当天的秒数"""
+        return t.hour * 3600 + t.minute * 60 + t.second
     
-    def _should_stop_instances(self, current_time: datetime) -> bool:
-        """判断是否应该停止实例"""
-        stop_time = self._parse_time(self.config['stop_time'])
-        current_time_only = current_time.time()
+    def _decide_action(self, current_time: datetime) -> Optional[str]:
+        """判断应该执行的操作，返回'start'、'stop'或None"""
+        now_sec = self._seconds_of_day(current_time.time())
         
-        # 处理跨天情况（如00:00）
-        if stop_time.hour == 0 and stop_time.minute == 0:
-            # 检查是否接近午夜
-            midnight = time(0, 0)
-            current_seconds = current_time_only.hour * 3600 + current_time_only.minute * 60
-            midnight_seconds = 0
-            
-            # 在23:55-00:05之间认为是停止时间
-            if current_seconds >= 23 * 3600 + 55 * 60 or current_seconds <= 5 * 60:
-                return True
-        else:
-            # 正常时间检查
-            stop_datetime = datetime.combine(current_time.date(), stop_time)
-            stop_datetime = stop_datetime.replace(tzinfo=current_time.tzinfo)
-            
-            time_diff = abs((current_time - stop_datetime).total_seconds())
-            return time_diff <= 300  # 5分钟内
+        # 在目标时间前后5分钟内触发，取模处理跨天情况（如00:00）
+        for action, target_sec in (('start', self._start_sec), ('stop', self._stop_sec)):
+            diff = (now_sec - target_sec) % SECONDS_PER_DAY
+            if diff <= TRIGGER_WINDOW_SECONDS or diff >= SECONDS_PER_DAY - TRIGGER_WINDOW_SECONDS:
+                return action
         
-        return False
+        return None
     
-    def _find_target_instances(self) -> List[Dict]:
-        """查找目标EC2实例"""
+    def _find_target_instances(self, state: str) -> List[Dict]:
+        """查找处于指定状态的目标EC2实例"""
         try:
             tag_key = self.config['tag_key']
             tag_value = self.config['tag_value']
-            exclude_ids = self.config.get('exclude_instance_ids', [])
             
-            response = ec2_client.describe_instances(
+            # 使用分页器，避免实例较多时只处理第一页结果
+            paginator = ec2_client.get_paginator('describe_instances')
+            pages = paginator.paginate(
                 Filters=[
                     {
                         'Name': f'tag:{tag_key}',
@@ -117,21 +163,22 @@ class EC2Scheduler:
                     },
                     {
                         'Name': 'instance-state-name',
-                        'Values': ['running', 'stopped']
+                        'Values': [state]
                     }
-                ]
+                ],
+                PaginationConfig={'PageSize': 1000}
             )
             
             instances = []
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    if instance['InstanceId'] not in exclude_ids:
-                        instances.append({
-                            'InstanceId': instance['InstanceId'],
-                            'State': instance['State']['Name'],
-                            'InstanceType': instance['InstanceType'],
-                            'Tags': instance.get('Tags', [])
-                        })
+            for page in pages:
+                for reservation in page['Reservations']:
+                    for instance in reservation['Instances']:
+                        if instance['InstanceId'] not in self._exclude_ids:
+                            instances.append({
+                                'InstanceId': instance['InstanceId'],
+                                'State': instance['State']['Name'],
+                                'InstanceType': instance['InstanceType']
+                            })
             
             logger.info(f"找到 {len(instances)} 个匹配的实例")
             return instances
@@ -140,43 +187,30 @@ class EC2Scheduler:
             logger.error(f"查找实例失败: {e}")
             return []
     
-    def _start_instances(self, instance_ids: List[str]) -> Dict:
-        """启动EC2实例"""
+    def _change_state(self, instance_ids: List[str], action: str) -> Dict:
+        """启动或停止EC2实例"""
         if not instance_ids:
             return {'success': [], 'failed': []}
         
-        if self.config.get('dry_run', False):
-            logger.info(f"[DRY RUN] 将启动实例: {instance_ids}")
-            return {'success': instance_ids, 'failed': []}
-        
-        try:
-            response = ec2_client.start_instances(InstanceIds=instance_ids)
-            success_ids = [inst['InstanceId'] for inst in response['StartingInstances']]
-            logger.info(f"成功启动实例: {success_ids}")
-            return {'success': success_ids, 'failed': []}
-            
-        except ClientError as e:
-            logger.error(f"启动实例失败: {e}")
-            return {'success': [], 'failed': instance_ids}
-    
-    def _stop_instances(self, instance_ids: List[str]) -> Dict:
-        """停止EC2实例"""
-        if not instance_ids:
-            return {'success': [], 'failed': []}
+        spec = STATE_ACTIONS[action]
+        api = getattr(ec2_client, spec['api'])
+        # 测试模式下使用EC2原生DryRun，仍会校验权限和配额
+        dry_run = bool(self.config.get('dry_run', False))
         
-        if self.config.get('dry_run', False):
-            logger.info(f"[DRY RUN] 将停止实例: {instance_ids}")
-            return {'success': instance_ids, 'failed': []}
+        def change_batch(batch_ids: List[str]) -> Tuple[List[str], List[str]]:
+            try:
+                response = api(InstanceIds=batch_ids, DryRun=dry_run)
+                return [inst['InstanceId'] for inst in response[spec['result_key']]], []
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'DryRunOperation':
+                    logger.info(f"[DRY RUN] 将{spec['label']}实例: {batch_ids}")
+                    return batch_ids, []
+                logger.error(f"{spec['label']}实例失败: {e}")
+                return [], batch_ids
         
-        try:
-            response = ec2_client.stop_instances(InstanceIds=instance_ids)
-            success_ids = [inst['InstanceId'] for inst in response['StoppingInstances']]
-            logger.info(f"成功停止实例: {success_ids}")
-            return {'success': success_ids, 'failed': []}
-            
-        except ClientError as e:
-            logger.error(f"停止实例失败: {e}")
-            return {'success': [], 'failed': instance_ids}
+        result = _run_in_batches(change_batch, instance_ids)
+        logger.info(f"成功{spec['label']}实例: {result['success']}")
+        return result
     
     def _send_notification(self, message: str):
         """发送通知"""
@@ -200,10 +234,25 @@ class EC2Scheduler:
             logger.info("EC2调度器已禁用")
             return {'status': 'disabled', 'message': '调度器已禁用'}
         
+        # 启用时才解析时区和启停时间（每次运行只解析一次），禁用的配置不因格式错误而失败
+        self._tz = ZoneInfo(self.config.get('timezone', 'Asia/Shanghai'))
+        self._start_sec = self._seconds_of_day(self._parse_time(self.config['start_time']))
+        self._stop_sec = self._seconds_of_day(self._parse_time(self.config['stop_time']))
+        
         current_time = self._get_current_time_in_timezone()
         logger.info(f"当前时间: {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
         
-        instances = self._find_target_instances()
+        # 先判断应该执行的操作，只查询与该操作相关状态的实例
+        action = self._decide_action(current_time)
+        if action is None:
+            logger.info("当前时间不在启动或停止时间窗口内")
+            return {
+                'status': 'no_action',
+                'current_time': current_time.isoformat(),
+                'message': '当前时间不在启动或停止时间窗口内'
+            }
+        
+        instances = self._find_target_instances(STATE_ACTIONS[action]['source_state'])
         if not instances:
             logger.info("未找到匹配的实例")
             return {'status': 'no_instances', 'message': '未找到匹配的实例'}
@@ -215,58 +264,40 @@ class EC2Scheduler:
             'actions': []
         }
         
-        # 判断应该执行的操作
-        should_start = self._should_start_instances(current_time)
-        should_stop = self._should_stop_instances(current_time)
+        instance_ids = [inst['InstanceId'] for inst in instances]
         
-        if should_start:
-            # 启动已停止的实例
-            stopped_instances = [inst['InstanceId'] for inst in instances if inst['State'] == 'stopped']
-            if stopped_instances:
-                start_result = self._start_instances(stopped_instances)
-                result['actions'].append({
-                    'action': 'start',
-                    'success': start_result['success'],
-                    'failed': start_result['failed']
-                })
-                
-                if start_result['success']:
-                    message = f"已启动 {len(start_result['success'])} 个实例: {start_result['success']}"
-                    logger.info(message)
-                    self._send_notification(message)
+        change_result = self._change_state(instance_ids, action)
+        result['actions'].append({
+            'action': action,
+            'success': change_result['success'],
+            'failed': change_result['failed']
+        })
         
-        elif should_stop:
-            # 停止正在运行的实例
-            running_instances = [inst['InstanceId'] for inst in instances if inst['State'] == 'running']
-            if running_instances:
-                stop_result = self._stop_instances(running_instances)
-                result['actions'].append({
-                    'action': 'stop',
-                    'success': stop_result['success'],
-                    'failed': stop_result['failed']
-                })
-                
-                if stop_result['success']:
-                    message = f"已停止 {len(stop_result['success'])} 个实例: {stop_result['success']}"
-                    logger.info(message)
-                    self._send_notification(message)
-        
-        else:
-            logger.info("当前时间不在启动或停止时间窗口内")
-            result['status'] = 'no_action'
-            result['message'] = '当前时间不在启动或停止时间窗口内'
+        if change_result['success']:
+            message = f"已{STATE_ACTIONS[action]['label']} {len(change_result['success'])} 个实例: {change_result['success']}"
+            logger.info(message)
+            self._send_notification(message)
         
         return result
 
 def lambda_handler(event, context):
-    """Lambda入口函数"""
-    logger.info(f"收到事件: {json.dumps(event, ensure_ascii=False)}")
+    """Lambda入口函数，收到{"warmup": true}预热事件时直接返回，不执行调度"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("收到事件: %s", json.dumps(event, ensure_ascii=False))
+    
+    if isinstance(event, dict) and event.get('warmup'):
+        logger.info("收到预热请求，跳过调度")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'status': 'warmup'}, ensure_ascii=False)
+        }
     
     try:
         scheduler = EC2Scheduler()
         result = scheduler.run()
         
-        logger.info(f"执行结果: {json.dumps(result, default=str, ensure_ascii=False)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("执行结果: %s", json.dumps(result, default=str, ensure_ascii=False))
         
         return {
             'statusCode': 200,
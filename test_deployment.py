@@ -6,190 +6,290 @@ EC2调度器部署测试脚本
 
 import boto3
 import json
+import sys
 import time
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-def test_lambda_function(function_name):
-    """测试Lambda函数"""
-    print(f"🧪 测试Lambda函数: {function_name}")
+# 优先使用orjson解析JSON，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+_loads = orjson.loads if orjson else json.loads
+
+def _install_orjson_parser():
+    """让botocore使用orjson解析JSON协议服务（Lambda、Logs、DynamoDB）的响应"""
+    try:
+        from botocore.parsers import BaseJSONParser
+    except ImportError:
+        return
+    if not hasattr(BaseJSONParser, '_parse_body_as_json'):
+        return
+    
+    def _parse_body_as_json(self, body_contents):
+        if not body_contents:
+            return {}
+        try:
+            return orjson.loads(body_contents)
+        except orjson.JSONDecodeError:
+            pass
+        # orjson比标准库严格（如孤立的代理字符、超出double范围的数字），回退到json重试
+        body = body_contents.decode(self.DEFAULT_ENCODING)
+        try:
+            return json.loads(body)
+        except ValueError:
+            # 与botocore一致：无法解析时把原始内容作为message返回
+            return {'message': body}
+    
+    BaseJSONParser._parse_body_as_json = _parse_body_as_json
+
+if orjson:
+    _install_orjson_parser()
+
+# Lambda测试调用的空事件和预热事件
+_EMPTY_PAYLOAD = b'{}'
+_WARMUP_PAYLOAD = b'{"warmup":true}'
+
+# 日志时间显示格式（按本地时区）
+_LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 配置表检查中每条配置的输出格式
+_CONFIG_ROW_FORMAT = (
+    "   - {config_id}: {description}\n"
+    "     标签: {tag_key}={tag_value}\n"
+    "     时间: {start_time}-{stop_time} ({timezone})\n"
+    "     状态: {enabled}"
+)
+
+# 所有客户端共用同一会话和连接配置（启用TCP keep-alive和连接池）
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=20,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    connect_timeout=2,
+    read_timeout=10
+)
+session = boto3.Session()
+
+class _Buf:
+    """测试输出缓冲区，测试结束后一次性写出"""
+    __slots__ = ('lines',)
     
-    lambda_client = boto3.client('lambda')
+    def __init__(self):
+        self.lines = []
+    
+    def p(self, *args):
+        self.lines.append(' '.join(map(str, args)))
+
+def test_lambda_function(function_name, lambda_client, buf):
+    """测试Lambda函数"""
+    buf.p(f"🧪 测试Lambda函数: {function_name}")
     
     try:
+        # 先同步发送预热请求（函数收到warmup事件后直接返回），正式调用复用已初始化的执行环境
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=_WARMUP_PAYLOAD
+        )
+        
         # 调用Lambda函数
         response = lambda_client.invoke(
             FunctionName=function_name,
-            Payload=json.dumps({})
+            InvocationType='RequestResponse',
+            LogType='None',
+            Payload=_EMPTY_PAYLOAD
         )
         
         # 读取响应
-        payload = json.loads(response['Payload'].read())
+        status_code = response['StatusCode']
+        raw_payload = response['Payload'].read()
+        payload = _loads(raw_payload)
         
-        if response['StatusCode'] == 200:
-            print("✅ Lambda函数调用成功")
+        if status_code == 200:
+            buf.p("✅ Lambda函数调用成功")
             
             # 解析响应体
-            if 'body' in payload:
-                body = json.loads(payload['body'])
-                print(f"📊 执行结果: {body.get('status', 'unknown')}")
+            body_raw = payload.get('body')
+            if body_raw:
+                body = _loads(body_raw)
+                buf.p(f"📊 执行结果: {body.get('status', 'unknown')}")
                 
-                if 'actions' in body:
-                    for action in body['actions']:
-                        print(f"   - 操作: {action['action']}")
-                        print(f"   - 成功: {len(action['success'])} 个实例")
-                        print(f"   - 失败: {len(action['failed'])} 个实例")
+                for action in body.get('actions', ()):
+                    success = action.get('success', ())
+                    failed = action.get('failed', ())
+                    buf.p(f"   - 操作: {action['action']}")
+                    buf.p(f"   - 成功: {len(success)} 个实例")
+                    buf.p(f"   - 失败: {len(failed)} 个实例")
             
             return True
         else:
-            print(f"❌ Lambda函数调用失败: {payload}")
+            buf.p(f"❌ Lambda函数调用失败: {payload}")
             return False
             
     except ClientError as e:
-        print(f"❌ Lambda函数调用异常: {e}")
+        buf.p(f"❌ Lambda函数调用异常: {e}")
         return False
 
-def test_dynamodb_config(table_name):
+def test_dynamodb_config(table_name, dynamodb_client, buf):
     """测试DynamoDB配置表"""
-    print(f"🗄️  测试DynamoDB表: {table_name}")
-    
-    dynamodb = boto3.resource('dynamodb')
+    buf.p(f"🗄️  测试DynamoDB表: {table_name}")
     
     try:
-        table = dynamodb.Table(table_name)
-        
-        # 检查表状态
-        table.load()
-        print(f"✅ 表状态: {table.table_status}")
+        # 使用分页器扫描配置，只读取需要显示的字段
+        paginator = dynamodb_client.get_paginator('scan')
+        pages = paginator.paginate(
+            TableName=table_name,
+            ProjectionExpression='#c, #d, tag_key, tag_value, start_time, stop_time, #tz, enabled',
+            ExpressionAttributeNames={'#c': 'config_id', '#d': 'description', '#tz': 'timezone'},
+            PaginationConfig={'PageSize': 100}
+        )
         
-        # 扫描配置
-        response = table.scan()
-        configs = response['Items']
+        # 低级客户端返回带类型标注的属性值，复用同一个反序列化器转换
+        deserialize = TypeDeserializer().deserialize
+        configs = [
+            {key: deserialize(value) for key, value in item.items()}
+            for page in pages
+            for item in page['Items']
+        ]
         
-        print(f"📋 找到 {len(configs)} 个配置:")
-        for config in configs:
-            print(f"   - {config['config_id']}: {config.get('description', 'N/A')}")
-            print(f"     标签: {config['tag_key']}={config['tag_value']}")
-            print(f"     时间: {config['start_time']}-{config['stop_time']} ({config['timezone']})")
-            print(f"     状态: {'启用' if config['enabled'] else '禁用'}")
+        buf.p(f"📋 找到 {len(configs)} 个配置:")
+        if configs:
+            buf.p('\n'.join(
+                _CONFIG_ROW_FORMAT.format_map({
+                    **config,
+                    'description': config.get('description', 'N/A'),
+                    'enabled': '启用' if config['enabled'] else '禁用'
+                })
+                for config in configs
+            ))
         
         return True
         
     except ClientError as e:
-        print(f"❌ DynamoDB表访问失败: {e}")
+        buf.p(f"❌ DynamoDB表访问失败: {e}")
         return False
 
-def test_iam_permissions(function_name):
+def test_iam_permissions(function_name, lambda_client, ec2_client, buf, verbose=False):
     """测试IAM权限"""
-    print("🔐 测试IAM权限...")
-    
-    lambda_client = boto3.client('lambda')
+    buf.p("🔐 测试IAM权限...")
     
     try:
-        # 获取函数配置
-        response = lambda_client.get_function(FunctionName=function_name)
-        role_arn = response['Configuration']['Role']
+        # 仅在详细模式下查询并显示Lambda角色
+        if verbose:
+            response = lambda_client.get_function(FunctionName=function_name)
+            buf.p(f"📋 Lambda角色: {response['Configuration']['Role']}")
         
-        print(f"📋 Lambda角色: {role_arn}")
-        
-        # 测试EC2权限
-        ec2_client = boto3.client('ec2')
+        # 测试EC2权限（DryRun只校验权限，不返回实例数据）
         try:
-            ec2_client.describe_instances(MaxResults=5)
-            print("✅ EC2权限正常")
-        except ClientError:
-            print("❌ EC2权限不足")
-            return False
+            ec2_client.describe_instances(DryRun=True)
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code == 'DryRunOperation':
+                buf.p("✅ EC2权限正常")
+            elif error_code == 'UnauthorizedOperation':
+                buf.p("❌ EC2权限不足")
+                return False
+            else:
+                raise
         
         return True
         
     except ClientError as e:
-        print(f"❌ 权限检查失败: {e}")
+        buf.p(f"❌ 权限检查失败: {e}")
         return False
 
-def test_cloudwatch_logs(function_name):
+def test_cloudwatch_logs(function_name, logs_client, buf):
     """测试CloudWatch日志"""
-    print("📊 测试CloudWatch日志...")
+    buf.p("📊 测试CloudWatch日志...")
     
-    logs_client = boto3.client('logs')
     log_group_name = f"/aws/lambda/{function_name}"
     
     try:
-        # 检查日志组
-        response = logs_client.describe_log_groups(
-            logGroupNamePrefix=log_group_name
+        # 分页查询最近1小时的日志事件（结果按时间升序，单页可能不完整甚至为空），
+        # 只保留最新的3条；日志组不存在时返回ResourceNotFoundException
+        paginator = logs_client.get_paginator('filter_log_events')
+        pages = paginator.paginate(
+            logGroupName=log_group_name,
+            startTime=int((time.time() - 3600) * 1000)
         )
+        recent_events = deque((event for page in pages for event in page['events']), maxlen=3)
+        buf.p("✅ CloudWatch日志组存在")
         
-        if response['logGroups']:
-            print("✅ CloudWatch日志组存在")
-            
-            # 获取最近的日志流
-            streams_response = logs_client.describe_log_streams(
-                logGroupName=log_group_name,
-                orderBy='LastEventTime',
-                descending=True,
-                limit=1
-            )
-            
-            if streams_response['logStreams']:
-                stream_name = streams_response['logStreams'][0]['logStreamName']
-                print(f"📝 最新日志流: {stream_name}")
-                
-                # 获取最近的日志事件
-                events_response = logs_client.get_log_events(
-                    logGroupName=log_group_name,
-                    logStreamName=stream_name,
-                    limit=5
-                )
-                
-                if events_response['events']:
-                    print("📋 最近的日志事件:")
-                    for event in events_response['events'][-3:]:  # 显示最后3条
-                        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', 
-                                                time.localtime(event['timestamp']/1000))
-                        print(f"   [{timestamp}] {event['message'].strip()}")
-            
-            return True
-        else:
-            print("❌ CloudWatch日志组不存在")
-            return False
+        if recent_events:
+            buf.p("📋 最近的日志事件:")
+            for event in recent_events:
+                timestamp = datetime.fromtimestamp(event['timestamp'] / 1000).strftime(_LOG_TIME_FORMAT)
+                message = event['message'].strip()
+                buf.p(f"   [{timestamp}] {message}")
+        
+        return True
             
     except ClientError as e:
-        print(f"❌ CloudWatch日志检查失败: {e}")
+        if e.response['Error']['Code'] == 'ResourceNotFoundException':
+            buf.p("❌ CloudWatch日志组不存在")
+        else:
+            buf.p(f"❌ CloudWatch日志检查失败: {e}")
         return False
 
+@lru_cache(maxsize=8)
+def _describe_stack_outputs(stack_name):
+    """查询CloudFormation堆栈输出（按堆栈名缓存，查询失败时抛出异常不缓存）"""
+    cloudformation = session.client('cloudformation', config=BOTO_CONFIG)
+    response = cloudformation.describe_stacks(StackName=stack_name)
+    stack = response['Stacks'][0]
+    # 只保留输出，缓存中不保存完整的堆栈描述
+    return {output['OutputKey']: output['OutputValue'] for output in stack.get('Outputs', [])}
+
 def get_stack_outputs(stack_name):
     """获取CloudFormation堆栈输出"""
-    cloudformation = boto3.client('cloudformation')
-    
     try:
-        response = cloudformation.describe_stacks(StackName=stack_name)
-        stack = response['Stacks'][0]
-        
-        outputs = {}
-        for output in stack.get('Outputs', []):
-            outputs[output['OutputKey']] = output['OutputValue']
-        
-        return outputs
+        return _describe_stack_outputs(stack_name)
         
     except ClientError as e:
         print(f"❌ 获取堆栈输出失败: {e}")
         return {}
 
+def run_test(test_name, test_func):
+    """执行单个测试，输出写入独立缓冲区，返回(是否通过, 输出内容)"""
+    buf = _Buf()
+    buf.p(f"\n🧪 测试: {test_name}")
+    try:
+        test_passed = bool(test_func(buf))
+        if test_passed:
+            buf.p(f"✅ {test_name} 测试通过")
+        else:
+            buf.p(f"❌ {test_name} 测试失败")
+    except Exception as e:
+        test_passed = False
+        buf.p(f"❌ {test_name} 测试异常: {e}")
+    return test_passed, '\n'.join(buf.lines) + '\n'
+
 def main():
     parser = argparse.ArgumentParser(description='EC2调度器部署测试')
     parser.add_argument('--stack-name', default='ec2-scheduler-dev', 
                        help='CloudFormation堆栈名称')
     parser.add_argument('--function-name', help='Lambda函数名称')
     parser.add_argument('--table-name', help='DynamoDB表名称')
+    parser.add_argument('--verbose', action='store_true', help='显示详细信息（如Lambda角色）')
     
     args = parser.parse_args()
     
     print("🚀 开始测试EC2调度器部署...")
     print(f"📋 堆栈名称: {args.stack_name}")
     
-    # 获取堆栈输出
-    outputs = get_stack_outputs(args.stack_name)
+    # 获取堆栈输出（已显式指定函数名和表名时无需查询堆栈）
+    if args.function_name and args.table_name:
+        outputs = {}
+    else:
+        outputs = get_stack_outputs(args.stack_name)
     
     function_name = args.function_name or outputs.get('LambdaFunctionName')
     table_name = args.table_name or outputs.get('ConfigTableName')
@@ -206,27 +306,38 @@ def main():
     print(f"🗄️  DynamoDB表: {table_name}")
     print("-" * 50)
     
-    # 执行测试
-    tests = [
-        ("DynamoDB配置表", lambda: test_dynamodb_config(table_name)),
-        ("IAM权限", lambda: test_iam_permissions(function_name)),
-        ("Lambda函数", lambda: test_lambda_function(function_name)),
-        ("CloudWatch日志", lambda: test_cloudwatch_logs(function_name)),
+    # 在主线程中预先创建客户端，供各测试线程共享
+    lambda_client = session.client('lambda', config=BOTO_CONFIG)
+    ec2_client = session.client('ec2', config=BOTO_CONFIG)
+    logs_client = session.client('logs', config=BOTO_CONFIG)
+    dynamodb_client = session.client('dynamodb', config=BOTO_CONFIG)
+    
+    # 前三项测试相互独立，并发执行
+    concurrent_tests = [
+        ("DynamoDB配置表", lambda buf: test_dynamodb_config(table_name, dynamodb_client, buf)),
+        ("IAM权限", lambda buf: test_iam_permissions(function_name, lambda_client, ec2_client, buf, args.verbose)),
+        ("Lambda函数", lambda buf: test_lambda_function(function_name, lambda_client, buf)),
+    ]
+    # 日志检查需要看到Lambda测试调用产生的日志，在上述测试完成后执行
+    followup_tests = [
+        ("CloudWatch日志", lambda buf: test_cloudwatch_logs(function_name, logs_client, buf)),
     ]
     
     passed = 0
-    total = len(tests)
+    total = len(concurrent_tests) + len(followup_tests)
     
-    for test_name, test_func in tests:
-        print(f"\n🧪 测试: {test_name}")
-        try:
-            if test_func():
-                passed += 1
-                print(f"✅ {test_name} 测试通过")
-            else:
-                print(f"❌ {test_name} 测试失败")
-        except Exception as e:
-            print(f"❌ {test_name} 测试异常: {e}")
+    # 按提交顺序输出结果，保证每次运行的报告顺序一致
+    with ThreadPoolExecutor(max_workers=len(concurrent_tests)) as executor:
+        futures = [executor.submit(run_test, test_name, test_func) for test_name, test_func in concurrent_tests]
+        for future in futures:
+            test_passed, output = future.result()
+            sys.stdout.write(output)
+            passed += test_passed
+    
+    for test_name, test_func in followup_tests:
+        test_passed, output = run_test(test_name, test_func)
+        sys.stdout.write(output)
+        passed += test_passed
     
     print("\n" + "=" * 50)
     print(f"📊 测试结果: {passed}/{total} 通过")